@@ -1,19 +1,48 @@
 # crawler.py
 
 import threading
-import queue
+import random
 import time
-import requests
+import urllib3
 import os
+import re
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import csv
-from collections import defaultdict
+import numpy as np
+from collections import defaultdict, deque
+from html import unescape
 from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
+from pybloom_live import ScalableBloomFilter
 
 # --- CONSTANTS AND CONFIGURATION ---
 
-# Crawler control: Exit when page limit is reached and active threads are below this number
-_DEL_STOP_AT = 5
+# Crawler control: How long (seconds) an idle worker sleeps before trying to steal work again
+_IDLE_WAIT = 0.05
+
+# Number of visited URLs a worker buffers before writing them to the log file
+_LOG_BATCH_SIZE = 64
+
+# Stack size for worker threads: they only run I/O and link parsing, so the default 8 MB is wasted
+_WORKER_STACK_SIZE = 512 * 1024
+
+# Number of independently locked shards the discovered-URL filter is split into
+_DEDUP_SHARDS = 16
+
+# Discovered URLs are tracked in Bloom filters; a false positive only means a link is skipped
+_BLOOM_CAPACITY = 1_000_000  # Initial capacity across all shards; each filter grows as needed
+_BLOOM_ERROR_RATE = 0.01
+
+# Matches the quoted href of an <a> tag in raw HTML bytes; fragment-only links are skipped.
+# Unquoted hrefs are missed, which is an acceptable trade for not building a DOM per page.
+_HREF_RE = re.compile(rb'<a\s(?:[^>]*?\s)?href\s*=\s*["\']([^"\'#]+)', re.IGNORECASE)
+
+# HTTP: follow redirects, but fail fast on connection/read errors instead of retrying
+_REQUEST_TIMEOUT = 5.0
+_RETRIES = urllib3.Retry(connect=0, read=0, redirect=5)
+_MAX_PAGE_BYTES = 1_000_000  # Bodies are truncated here; far more than any page needs for link extraction
 
 # Color codes for console output
 RED = "\033[31m"
@@ -22,29 +51,85 @@ GREEN = "\033[32m"
 BLUE = "\033[34m"
 C_END = "\033[0m"
 
+@functools.lru_cache(maxsize=100_000)
+def get_domain(url):
+    """Extracts the network location (domain) from a URL. Results are cached per URL."""
+    try:
+        return urlparse(url).netloc
+    except Exception:
+        return ""
+
+def _parse_links(html, base_url, max_links):
+    """
+    Scans raw HTML bytes to extract up to `max_links` absolute URLs.
+    Returns a set of (clean_url, domain) pairs so callers don't have to re-parse the URLs.
+    Defined at module level so it can be pickled and run in the parse process pool.
+    """
+    links = []  # Most hrefs on a page are unique, so dedupe once at the end instead of per insert
+    for match in _HREF_RE.finditer(html):
+        if len(links) >= max_links:
+            break
+        href = match.group(1).decode('utf-8', 'ignore').strip()
+        if '&' in href:
+            href = unescape(href)
+        try:
+            full_url = urljoin(base_url, href)
+            parsed_url = urlparse(full_url)
+        except ValueError:  # e.g. a malformed IPv6 host like "http://[bad"
+            continue
+        if parsed_url.scheme in ['http', 'https'] and parsed_url.netloc:
+            clean_url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}".strip('/')
+            links.append((clean_url, parsed_url.netloc))
+    return set(links)
+
 class Crawler:
     """
     A multi-threaded web crawler that discovers web pages, extracts links,
     and generates a graph of domain relationships for ranking.
     """
-    def __init__(self, max_links, pages_limit, max_threads):
+    def __init__(self, max_links, pages_limit, max_threads, verbose=False):
         # Parameters
         self.max_links = max_links
         self.pages_limit = pages_limit
         self.max_threads = max_threads
+        self.verbose = verbose  # Per-page progress output; off by default since print() serializes threads
 
-        # Thread-safe data structures and counters
-        self.link_queue = queue.Queue()
-        self.discovered_sites = set()
-        self.page_rank = defaultdict(set)
-        self.working_threads = 0
+        # Per-worker link deques: owners pop from the right, idle workers steal from the left.
+        # deque appends/pops are atomic, so the deques themselves need no extra locking.
+        self.link_queues = [deque() for _ in range(max_threads)]
+        self.pending_links = 0  # URLs queued or in progress; the crawl ends when this hits zero
+        self.discovered_shards = [
+            (ScalableBloomFilter(initial_capacity=_BLOOM_CAPACITY // _DEDUP_SHARDS,
+                                 error_rate=_BLOOM_ERROR_RATE), threading.Lock())
+            for _ in range(_DEDUP_SHARDS)
+        ]
+        # Domain graph: each domain gets an integer id, edges are (src_id, dst_id) pairs
+        self.domain_to_id = {}
+        self.domains = []
+        self.edges = set()
         self.total_visited_pages = 0
-        self.pages_limit_reached = False
+        self.workers = []
+
+        # Shared connection pools: keep TCP/TLS connections alive across requests to the same host
+        self.http = urllib3.PoolManager(
+            num_pools=64,
+            maxsize=max_threads,
+            headers={'User-Agent': 'Mozilla/5.0 (compatible; PythonCrawler/1.0)'},
+        )
 
         # Synchronization primitives
-        self.data_lock = threading.Lock()  # Protects counters, discovered_sites, page_rank
+        # One lock per structure, so unrelated updates never wait on each other
+        self.counter_lock = threading.Lock()  # Protects total_visited_pages
+        self.rank_lock = threading.Lock()  # Protects domain_to_id, domains, edges
+        self.pending_lock = threading.Lock()
         self.timing_lock = threading.Lock()
-        self.condition = threading.Condition()  # For sleep/awake mechanism in the main loop
+        self.log_lock = threading.Lock()
+        self.stop_event = threading.Event()  # Set when the page limit is hit or the queue drains
+
+        # Link extraction runs in worker processes so parsing isn't serialized on the GIL.
+        # 'spawn' avoids forking a process that already has crawler threads running.
+        self.parse_pool = ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                              mp_context=multiprocessing.get_context("spawn"))
 
         # Logging and performance metrics
         self.log_file = open("logs.txt", "w")
@@ -53,146 +138,224 @@ class Crawler:
     def log(self, message):
         """Writes a message to the log file."""
         self.log_file.write(message + "\n")
-        self.log_file.flush()
+
+    def log_many(self, messages):
+        """Writes a batch of messages to the log file in a single call."""
+        if messages:
+            self.log_file.write("\n".join(messages) + "\n")
 
     def initialize(self):
         """Initializes the crawler by creating necessary directories and loading seed URLs."""
         self.log("Crawler initialized")
         os.makedirs("OUTPUT", exist_ok=True)
         
+        seeds = []
         try:
             with open("initialLinks.txt", "r") as f:
                 next(f)  # Skip the count line
                 for line in f:
                     url = line.strip()
                     if url:
-                        self.link_queue.put(url)
+                        seeds.append(url)
         except FileNotFoundError:
             print(f"{RED}Error: 'initialLinks.txt' not found. Using default URL.{C_END}")
-            self.link_queue.put("https://www.google.com")
+            seeds.append("https://www.google.com")
+
+        # Deal the seeds out round-robin so every worker starts with its own work
+        for i, url in enumerate(seeds):
+            self.link_queues[i % self.max_threads].append(url)
+        self.pending_links = len(seeds)
+        if not seeds:
+            self.stop_event.set()
 
-    @staticmethod
-    def get_domain(url):
-        """Extracts the network location (domain) from a URL."""
+        default_stack_size = threading.stack_size(_WORKER_STACK_SIZE)
         try:
-            return urlparse(url).netloc
-        except Exception:
-            return ""
+            for wid in range(self.max_threads):
+                worker = threading.Thread(target=self.worker, args=(wid,))
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+        finally:
+            threading.stack_size(default_stack_size)
+
+    def domain_id(self, domain):
+        """Returns the integer id of a domain, assigning a new one if needed. Caller holds rank_lock."""
+        node = self.domain_to_id.get(domain)
+        if node is None:
+            node = self.domain_to_id[domain] = len(self.domains)
+            self.domains.append(domain)
+        return node
+
+    def domain_graph(self):
+        """Packs the collected edges into CSR form: row i's targets are indices[indptr[i]:indptr[i+1]]."""
+        num_domains = len(self.domains)
+        edges = np.array(sorted(self.edges), dtype=np.int64).reshape(-1, 2)
+        indptr = np.zeros(num_domains + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edges[:, 0], minlength=num_domains), out=indptr[1:])
+        return indptr, edges[:, 1]
 
     def downloader(self, url):
-        """Downloads the HTML content of a given URL."""
+        """Downloads up to `_MAX_PAGE_BYTES` of a URL's HTML; non-HTML responses are skipped."""
         try:
-            headers = {'User-Agent': 'Mozilla/5.0 (compatible; PythonCrawler/1.0)'}
-            response = requests.get(url, timeout=5, headers=headers)
-            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-            return response.text
-        except requests.RequestException as e:
+            response = self.http.request('GET', url, timeout=_REQUEST_TIMEOUT, retries=_RETRIES,
+                                         preload_content=False)
+            try:
+                if not 200 <= response.status < 300:
+                    print(f"{RED}Error downloading {url}: HTTP {response.status}{C_END}")
+                    return b""
+                if 'html' not in response.headers.get('Content-Type', ''):
+                    return b""
+                return response.read(_MAX_PAGE_BYTES, decode_content=True)
+            finally:
+                # A fully read body has already returned its connection to the pool;
+                # this only drops connections left with unread (skipped or truncated) data.
+                response.close()
+        except urllib3.exceptions.HTTPError as e:
             print(f"{RED}Error downloading {url}: {e}{C_END}")
-            return ""
+            return b""
 
     def get_links(self, html, base_url):
-        """Parses HTML to extract up to `max_links` absolute URLs."""
-        soup = BeautifulSoup(html, 'html.parser')
-        links = set()
-        for a_tag in soup.find_all('a', href=True):
-            if len(links) >= self.max_links:
-                break
-            href = a_tag['href']
-            full_url = urljoin(base_url, href)
-            parsed_url = urlparse(full_url)
-            if parsed_url.scheme in ['http', 'https'] and parsed_url.netloc:
-                clean_url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}".strip('/')
-                links.add(clean_url)
-        return links
+        """
+        Extracts up to `max_links` (clean_url, domain) pairs from raw HTML bytes, in-process.
+        Used when the parse pool is unusable (e.g. one of its processes was killed).
+        """
+        return _parse_links(html, base_url, self.max_links)
 
-    def child_thread(self, url, th_no):
-        """The target function for each worker thread."""
+    def child_thread(self, url, th_no, own_queue):
+        """Downloads, parses and records a single page; called from a worker thread."""
         # 1. Download
         t1 = time.perf_counter()
         html = self.downloader(url)
         d_time = (time.perf_counter() - t1) * 1_000_000  # microseconds
-        if html:
+        if html and self.verbose:
             print(f"{CYAN}Thread {th_no} downloaded page.{C_END}")
 
         # 2. Parse
         t1 = time.perf_counter()
-        linked_sites = self.get_links(html, url)
+        if html:
+            try:
+                linked_sites = self.parse_pool.submit(_parse_links, html, url, self.max_links).result()
+            except BrokenProcessPool:
+                linked_sites = self.get_links(html, url)
+        else:
+            linked_sites = set()
         p_time = (time.perf_counter() - t1) * 1_000_000
-        print(f"{CYAN}Thread {th_no} extracted {len(linked_sites)} links.{C_END}")
+        if self.verbose:
+            print(f"{CYAN}Thread {th_no} extracted {len(linked_sites)} links.{C_END}")
 
         # 3. Update shared state
         t1 = time.perf_counter()
-        curr_domain = self.get_domain(url)
+        curr_domain = get_domain(url)
         if curr_domain:
-            with self.data_lock:
-                for link in linked_sites:
-                    if link not in self.discovered_sites:
-                        self.discovered_sites.add(link)
-                        self.link_queue.put(link)
-                        link_domain = self.get_domain(link)
-                        if link_domain:
-                            self.page_rank[curr_domain].add(link_domain)
+            # Group by shard first so each shard lock is taken at most once per page
+            links_by_shard = defaultdict(dict)
+            for link, link_domain in linked_sites:
+                links_by_shard[hash(link) % _DEDUP_SHARDS][link] = link_domain
+
+            new_links = []
+            new_domains = set()
+            for shard_no, links in links_by_shard.items():
+                shard, shard_lock = self.discovered_shards[shard_no]
+                with shard_lock:  # pybloom_live filters are not thread-safe
+                    for link, link_domain in links.items():
+                        if link not in shard:
+                            shard.add(link)
+                            new_links.append(link)
+                            new_domains.add(link_domain)
+
+            if new_domains:
+                with self.rank_lock:
+                    src = self.domain_id(curr_domain)
+                    self.edges.update((src, self.domain_id(domain)) for domain in new_domains)
+
+            # Count the new links before publishing them, so pending_links never drops to zero early
+            with self.pending_lock:
+                self.pending_links += len(new_links)
+            own_queue.extend(new_links)
         u_time = (time.perf_counter() - t1) * 1_000_000
-        print(f"{CYAN}Thread {th_no} updated shared variables.{C_END}")
+        if self.verbose:
+            print(f"{CYAN}Thread {th_no} updated shared variables.{C_END}")
 
         with self.timing_lock:
             self.thread_timings.append([d_time, p_time, u_time])
+        if self.verbose:
+            print(f"{BLUE}Thread {th_no} finished.{C_END}")
+
+    def next_link(self, wid):
+        """Pops from the worker's own deque, or steals the oldest link from a random peer."""
+        try:
+            return self.link_queues[wid].pop()
+        except IndexError:
+            pass
 
-        # Notify main thread of completion
-        with self.condition:
-            with self.data_lock:
-                self.working_threads -= 1
-            print(f"{BLUE}Thread {th_no} finished, total working: {self.working_threads}{C_END}")
-            self.condition.notify()
-
-    def create_thread(self):
-        """Creates and starts a new worker thread."""
-        with self.data_lock:
-            if self.link_queue.empty():
-                return
-            current_site = self.link_queue.get()
-            self.total_visited_pages += 1
-            th_no = self.total_visited_pages
-            self.working_threads += 1
-
-            self.log(current_site)
-            print(f"{GREEN}Creating a thread for {current_site}, total: {self.working_threads}{C_END}")
-
-            if self.total_visited_pages >= self.pages_limit:
-                self.pages_limit_reached = True
-                print(f"{RED}~!!! Page Limit Reached Here !!!~{C_END}")
-
-        thread = threading.Thread(target=self.child_thread, args=(current_site, th_no))
-        thread.daemon = True
-        thread.start()
+        start = random.randrange(self.max_threads)
+        for k in range(self.max_threads):
+            victim = (start + k) % self.max_threads
+            if victim == wid:
+                continue
+            try:
+                return self.link_queues[victim].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def finish_link(self):
+        """Marks one queued URL as done and stops the crawl once nothing is left anywhere."""
+        with self.pending_lock:
+            self.pending_links -= 1
+            drained = self.pending_links == 0
+        if drained and not self.stop_event.is_set():
+            print("Exiting: No more links in queue and no active threads.")
+            self.stop_event.set()
+
+    def worker(self, wid):
+        """Long-lived worker loop: takes URLs off its own deque (or a peer's) until the crawl is stopped."""
+        own_queue = self.link_queues[wid]
+        log_buffer = []
+        try:
+            while not self.stop_event.is_set():
+                current_site = self.next_link(wid)
+                if current_site is None:
+                    self.stop_event.wait(_IDLE_WAIT)
+                    continue
+
+                try:
+                    with self.counter_lock:
+                        if self.total_visited_pages >= self.pages_limit:
+                            continue
+                        self.total_visited_pages += 1
+                        th_no = self.total_visited_pages
+
+                        if self.total_visited_pages >= self.pages_limit:
+                            self.stop_event.set()
+                            print(f"{RED}~!!! Page Limit Reached Here !!!~{C_END}")
+
+                    log_buffer.append(current_site)
+                    if self.verbose:
+                        print(f"{GREEN}Worker {wid} picked up {current_site}, page no: {th_no}{C_END}")
+
+                    try:
+                        self.child_thread(current_site, th_no, own_queue)
+                    except Exception as e:
+                        # One bad page must not take its worker (and the whole crawl) down with it
+                        print(f"{RED}Error processing {current_site}: {e}{C_END}")
+                finally:
+                    self.finish_link()
+
+                if len(log_buffer) >= _LOG_BATCH_SIZE:
+                    with self.log_lock:
+                        self.log_many(log_buffer)
+                    log_buffer.clear()
+        finally:
+            with self.log_lock:
+                self.log_many(log_buffer)
 
     def run_crawler(self):
         """The main control loop for the crawler."""
-        while True:
-            with self.condition:
-                with self.data_lock:
-                    limit_hit = self.pages_limit_reached
-                    threads_working = self.working_threads
-                    queue_has_links = not self.link_queue.empty()
-
-                if limit_hit:
-                    if threads_working < _DEL_STOP_AT:
-                        print(f"{RED}Exiting: Page limit reached and active threads are below threshold.{C_END}")
-                        break
-                    else:
-                        print("Going to sleep (page limit reached, waiting for threads to finish)...")
-                        self.condition.wait()
-                        print("Awakened.")
-                else:
-                    if threads_working < self.max_threads and queue_has_links:
-                        self.create_thread()
-                    elif threads_working == 0 and not queue_has_links:
-                        print("Exiting: No more links in queue and no active threads.")
-                        break
-                    else:
-                        print("Going to sleep (max threads reached or queue is empty)...")
-                        self.condition.wait()
-                        print("Awakened.")
+        self.stop_event.wait()
+        print("Waiting for workers to finish their current pages...")
+        for worker in self.workers:
+            worker.join()
         self.log("Crawling completed.")
 
     def show_results(self):
@@ -201,10 +364,16 @@ class Crawler:
             writer = csv.writer(f)
             writer.writerows(self.thread_timings)
 
+        indptr, indices = self.domain_graph()
+        np.savez("OUTPUT/pagerank_graph.npz",
+                 domains=np.array(self.domains, dtype=str), indptr=indptr, indices=indices)
+
         with open("OUTPUT/pagerank.csv", "w", newline="") as f:
             writer = csv.writer(f)
-            for domain, linked_domains in self.page_rank.items():
-                writer.writerow([domain] + list(linked_domains))
+            for node, domain in enumerate(self.domains):
+                targets = indices[indptr[node]:indptr[node + 1]]
+                if len(targets):
+                    writer.writerow([domain] + [self.domains[t] for t in targets])
 
         dashline = "-----------------------------------------------------"
         print("\nCrawl Summary:")
@@ -217,5 +386,7 @@ class Crawler:
 
     def close(self):
         """Closes any open resources, like the log file."""
-        self.log(f"Final queue size: {self.link_queue.qsize()}")
-        self.log_file.close()
\ No newline at end of file
+        self.log(f"Final queue size: {sum(len(q) for q in self.link_queues)}")
+        self.log_file.close()
+        self.parse_pool.shutdown()
+        self.http.clear()
@@ -3,10 +3,12 @@
 import time
 import csv
 import sys
+import socket
+import functools
 
 from crawler import Crawler, RED, C_END
-from ranker import (read_corpus, counter_ranker, sample_pagerank, 
-                    iterate_pagerank, print_ranks, DAMPING, SAMPLES)
+from ranker import (read_corpus, read_graph, counter_ranker, sample_pagerank,
+                    iterate_pagerank_graph, print_ranks, DAMPING, SAMPLES)
 
 # --- MAIN EXECUTION BLOCK ---
 
@@ -17,6 +19,7 @@ def main():
         max_links = int(input("Enter Max Links per Page: "))
         pages_limit = int(input("Enter Page Download Limit: "))
         max_threads = int(input("Enter Max Concurrent Threads: "))
+        verbose = input("Show per-page progress output? (y/N): ").strip().lower() == 'y'
 
         # Get ranker choice from user
         ranker_flag = ''
@@ -38,8 +41,10 @@ def main():
 
     # === Part 1: Crawling ===
     print("\n--- Starting Crawler ---")
+    # Cache DNS lookups for the run: new connections to an already-seen host skip resolution
+    socket.getaddrinfo = functools.lru_cache(maxsize=10_000)(socket.getaddrinfo)
     start_time = time.perf_counter()
-    my_crawler = Crawler(max_links, pages_limit, max_threads)
+    my_crawler = Crawler(max_links, pages_limit, max_threads, verbose)
     my_crawler.initialize()
     my_crawler.run_crawler()
     my_crawler.show_results()
@@ -66,7 +71,10 @@ def main():
         ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
         print_ranks(ranks, f"Domain Name Rankings (PageRank via Sampling, n={SAMPLES})")
     elif ranker_flag == "-ip":
-        ranks = iterate_pagerank(corpus, DAMPING)
+        graph = read_graph()
+        if graph is None:
+            return
+        ranks = iterate_pagerank_graph(*graph, DAMPING)
         print_ranks(ranks, "Domain Name Rankings (PageRank via Iteration)")
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 # ranker.py
 
 import csv
-import random
+import numpy as np
 from collections import defaultdict
+from scipy.sparse import csr_matrix, diags
 
 # --- CONSTANTS AND CONFIGURATION ---
 
@@ -36,71 +37,94 @@ def read_corpus():
             pages[page] = set()
     return dict(pages)
 
+def read_graph():
+    """Reads the integer-id domain graph (CSR arrays) written by the crawler."""
+    try:
+        with np.load("OUTPUT/pagerank_graph.npz") as data:
+            domains = data["domains"].tolist()
+            indptr, indices = data["indptr"], data["indices"]
+    except FileNotFoundError:
+        print(f"{RED}pagerank_graph.npz not found. Cannot run ranker.{C_END}")
+        return None
+
+    num_pages = len(domains)
+    adjacency = csr_matrix((np.ones(len(indices)), indices, indptr), shape=(num_pages, num_pages))
+    return domains, adjacency
+
+def corpus_to_graph(corpus):
+    """Converts a {page: set(linked pages)} corpus into (pages, sparse adjacency matrix)."""
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    rows = [index[page] for page, links in corpus.items() for _ in links]
+    cols = [index[link] for links in corpus.values() for link in links]
+    adjacency = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(pages), len(pages)))
+    return pages, adjacency
+
 def counter_ranker(corpus):
     """Ranks pages based on the number of outgoing links."""
     return {page: len(links) for page, links in corpus.items()}
 
-def transition_model(corpus, page, damping_factor):
+def sample_pagerank(corpus, damping_factor, n):
     """
-    Returns a probability distribution over which page to visit next.
-    With probability `damping_factor`, a random link from the current page is chosen.
+    Estimates PageRank by taking `n` steps of a random surfer and counting visits.
+    With probability `damping_factor`, a random link from the current page is followed.
     With probability `1 - damping_factor`, a random page from the entire corpus is chosen.
+    A page with no links always jumps to a random page, as if it linked to every page.
     """
-    prob_dist = {}
-    linked_pages = corpus.get(page, set())
-    num_links = len(linked_pages)
-    num_total_pages = len(corpus)
-    
-    if num_links > 0:
-        prob_from_link = damping_factor / num_links
-        prob_from_all = (1 - damping_factor) / num_total_pages
-        for p in corpus:
-            prob_dist[p] = prob_from_all + (prob_from_link if p in linked_pages else 0)
-    else:
-        # If a page has no links, assume it links to all pages with equal probability
-        for p in corpus:
-            prob_dist[p] = 1 / num_total_pages
-    return prob_dist
-
-def sample_pagerank(corpus, damping_factor, n):
-    """Estimates PageRank by taking `n` random samples from the transition model."""
-    pagerank = {page: 0 for page in corpus}
     if not corpus:
-        return pagerank
-        
-    current_page = random.choice(list(corpus.keys()))
-    for _ in range(n):
-        pagerank[current_page] += 1
-        model = transition_model(corpus, current_page, damping_factor)
-        pages, probabilities = zip(*model.items())
-        current_page = random.choices(pages, weights=probabilities, k=1)[0]
-        
-    return {page: count / n for page, count in pagerank.items()}
+        return {}
+
+    pages, adjacency = corpus_to_graph(corpus)
+    indptr, indices = adjacency.indptr.tolist(), adjacency.indices.tolist()
+    num_pages = len(pages)
+
+    # Draw all random numbers up front instead of one call per step
+    rng = np.random.default_rng()
+    follow_link = (rng.random(n) < damping_factor).tolist()
+    choices = rng.random(n).tolist()
+
+    counts = [0] * num_pages
+    current_page = int(rng.integers(num_pages))
+    for step in range(n):
+        counts[current_page] += 1
+        start, end = indptr[current_page], indptr[current_page + 1]
+        if follow_link[step] and end > start:
+            current_page = indices[start + int(choices[step] * (end - start))]
+        else:
+            current_page = int(choices[step] * num_pages)
+
+    return {page: count / n for page, count in zip(pages, counts)}
 
 def iterate_pagerank(corpus, damping_factor):
     """Calculates PageRank by repeatedly updating values until they converge."""
-    num_pages = len(corpus)
+    return iterate_pagerank_graph(*corpus_to_graph(corpus), damping_factor)
+
+def iterate_pagerank_graph(pages, adjacency, damping_factor):
+    """
+    Calculates PageRank on a sparse adjacency matrix (row = linker, column = linked page)
+    by power iteration, one sparse matrix-vector product per step.
+    """
+    num_pages = len(pages)
     if num_pages == 0:
         return {}
-        
-    pagerank = {page: 1 / num_pages for page in corpus}
-    incoming_links = {p: {linker for linker, links in corpus.items() if p in links} for p in corpus}
-    
+
+    # Pages without outgoing links keep an all-zero row, as in the dict-based version
+    out_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    inv_degree = np.divide(1.0, out_degree, out=np.zeros(num_pages), where=out_degree > 0)
+    transition_t = (diags(inv_degree) @ adjacency).T.tocsr()
+
+    pagerank = np.full(num_pages, 1 / num_pages)
+    random_surf_prob = (1 - damping_factor) / num_pages
     while True:
-        new_pagerank = {}
-        for page in corpus:
-            random_surf_prob = (1 - damping_factor) / num_pages
-            link_prob = sum(pagerank[linker] / len(corpus[linker]) for linker in incoming_links[page] if corpus[linker])
-            new_pagerank[page] = random_surf_prob + damping_factor * link_prob
-        
-        max_change = max(abs(pagerank[p] - new_pagerank[p]) for p in corpus)
+        new_pagerank = random_surf_prob + damping_factor * (transition_t @ pagerank)
+        max_change = np.abs(new_pagerank - pagerank).max()
         pagerank = new_pagerank
         if max_change < 0.001:
             break
-            
+
     # Normalize to ensure the sum is 1
-    total = sum(pagerank.values())
-    return {p: rank / total for p, rank in pagerank.items()}
+    pagerank /= pagerank.sum()
+    return dict(zip(pages, pagerank.tolist()))
 
 def print_ranks(ranks, title):
     """Prints a formatted table of ranked domains."""